@@ -0,0 +1,228 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import httpx
+
+# 智谱AI的OpenAI兼容接口地址
+ZHIPU_BASE_URL = "https://open.bigmodel.cn/api/paas/v4"
+
+# 需要重试的HTTP状态码：限流和服务端错误
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """调用大模型失败（不可重试的错误，或重试次数已用尽）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = None
+
+
+class LLMClient:
+    """
+    大模型调用层：连接池复用、单请求截止时间、带抖动的指数退避重试，以及可选的对冲请求。
+
+    对冲请求：当主请求耗时超过近期延迟的指定分位数时，再发送一个相同的请求，
+    先返回的结果胜出，另一个被取消。对冲请求数量受预算限制（占最近请求数的比例），
+    避免费用翻倍；主请求被限流（429）后不再对冲，避免向刚限流的服务重复发送请求。
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = ZHIPU_BASE_URL,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_budget: float = 0.1,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            api_key: API密钥
+            model: 使用的模型名称
+            base_url: 接口地址
+            timeout: 单次调用的总截止时间（秒），包含所有重试和对冲
+            connect_timeout: 建立连接的超时时间（秒）
+            max_retries: 遇到429/5xx或网络错误时的最大重试次数
+            backoff_base: 退避的基础时长（秒）
+            backoff_max: 单次退避的最大时长（秒）
+            hedge: 是否启用对冲请求
+            hedge_percentile: 触发对冲的延迟分位数
+            hedge_budget: 对冲请求占最近 latency_window 个请求的最大比例
+            hedge_min_samples: 启用对冲前至少需要的延迟样本数
+            latency_window: 用于计算分位数和对冲预算的最近请求数
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 连接池最大保活连接数
+            transport: 自定义传输层（测试时使用）
+        """
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.hedge_min_samples = hedge_min_samples
+
+        self._latencies = deque(maxlen=latency_window)
+        # 最近请求是否发送了对冲请求，按滑动窗口计算对冲预算
+        self._hedge_flags = deque(maxlen=latency_window)
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            transport=transport,
+        )
+
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        调用对话补全接口并返回回答文本
+
+        Args:
+            messages: 对话消息列表
+            **kwargs: 其他透传给接口的参数，如 temperature、max_tokens
+
+        Returns:
+            模型回答的文本
+
+        Raises:
+            asyncio.TimeoutError: 超过截止时间
+            LLMError: 调用失败
+        """
+        payload = {"model": self.model, "messages": messages, **kwargs}
+        deadline = time.monotonic() + self.timeout
+        data = await asyncio.wait_for(self._hedged(payload, deadline), timeout=self.timeout)
+        try:
+            return data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f"响应格式不正确: {data}")
+
+    async def aclose(self):
+        """关闭连接池"""
+        await self._client.aclose()
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        根据近期延迟计算触发对冲的等待时长
+
+        Returns:
+            等待时长（秒），样本不足时返回None
+        """
+        if len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(int(len(ordered) * self.hedge_percentile), len(ordered) - 1)
+        return ordered[index]
+
+    def _hedge_allowed(self) -> bool:
+        # 窗口内（含当前请求）的对冲数量不超过预算
+        window = min(len(self._hedge_flags) + 1, self._hedge_flags.maxlen)
+        return sum(self._hedge_flags) + 1 <= self.hedge_budget * window
+
+    async def _hedged(self, payload: dict, deadline: float) -> dict:
+        state = {"rate_limited": False}
+        primary = asyncio.ensure_future(self._with_retries(payload, deadline, state))
+        delay = self.hedge_delay() if self.hedge else None
+        if delay is None:
+            self._hedge_flags.append(False)
+            return await primary
+
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done or state["rate_limited"] or not self._hedge_allowed():
+                self._hedge_flags.append(False)
+                return await primary
+
+            self._hedge_flags.append(True)
+            pending.add(asyncio.ensure_future(self._with_retries(payload, deadline, state)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 先取出本轮所有任务的异常，避免asyncio报告"Task exception was never retrieved"
+                succeeded = None
+                for task in done:
+                    if task.exception() is None:
+                        succeeded = succeeded or task
+                    else:
+                        error = task.exception()
+                if succeeded is not None:
+                    return succeeded.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _with_retries(self, payload: dict, deadline: float, state: Optional[dict] = None) -> dict:
+        attempt = 0
+        while True:
+            try:
+                return await self._send(payload, deadline)
+            except httpx.TransportError as e:
+                error = LLMError(f"网络错误: {e}")
+                error.__cause__ = e
+            except LLMError as e:
+                if e.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+                if e.status_code == 429 and state is not None:
+                    state["rate_limited"] = True
+                error = e
+            if attempt >= self.max_retries:
+                raise error
+            delay = error.retry_after or self._backoff(attempt)
+            # 退避后已超过截止时间则不再重试
+            if time.monotonic() + delay >= deadline:
+                raise error
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        # 全抖动指数退避，避免大量请求同时重试
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _send(self, payload: dict, deadline: float) -> dict:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        start = time.monotonic()
+        response = await self._client.post(
+            "/chat/completions",
+            json=payload,
+            timeout=httpx.Timeout(remaining, connect=min(self.connect_timeout, remaining)),
+        )
+        if response.status_code != 200:
+            error = LLMError(f"HTTP {response.status_code}: {response.text}", status_code=response.status_code)
+            error.retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+            raise error
+        self._latencies.append(time.monotonic() - start)
+        return response.json()
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
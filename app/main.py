@@ -9,7 +9,6 @@ os.environ['HF_ENDPOINT'] = 'https://hf-mirror.com'
 from dotenv import load_dotenv
 import tempfile
 import uuid
-from zhipuai import ZhipuAI
 from typing import Dict, List, Optional
 import asyncio
 import time
@@ -18,10 +17,14 @@ import re
 # 导入自定义模块
 from app.models.embedding import EmbeddingModel
 from app.rag.core import RAGCore
+from app.rag.session_store import SessionStore
 from app.parsers.pdf_parser import PDFParser
 from app.parsers.docx_parser import DOCXParser
 from app.parsers.txt_parser import TXTParser
 from app.parsers.md_parser import MDParser
+from app.llm.client import LLMClient, LLMError
+from app.profiling.profiler import ProfileStore
+from app.profiling.middleware import install_profiling
 load_dotenv()
 
 app = FastAPI(title="文档问答系统")
@@ -35,6 +38,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 按需性能分析：携带 X-Profile 请求头（值为 torch 时使用torch profiler）和 X-Profile-Token 共享密钥，
+# 或按采样率触发；未启用时不注册中间件
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+if PROFILE_ENABLED:
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+    if not PROFILE_TOKEN:
+        raise ValueError("启用性能分析时请设置 PROFILE_TOKEN 环境变量")
+    install_profiling(
+        app,
+        ProfileStore(os.getenv("PROFILE_DIR"), max_files=int(os.getenv("PROFILE_MAX_FILES", "50"))),
+        token=PROFILE_TOKEN,
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    )
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -52,6 +69,34 @@ session_last_access: Dict[str, float] = {}
 # 会话超时时间（秒），例如2小时
 SESSION_TIMEOUT = 2 * 60 * 60
 
+# 多进程部署时各worker共享的会话目录，未设置时会话只保存在本进程内存中
+SESSION_DIR = os.getenv("SESSION_DIR")
+session_store = SessionStore(SESSION_DIR) if SESSION_DIR else None
+
+def get_session(session_id: str) -> Optional[RAGCore]:
+    """
+    获取会话：先查本进程内存，再查共享会话目录（会话可能由其他worker创建）
+    
+    Args:
+        session_id: 会话ID
+        
+    Returns:
+        RAG核心实例，会话不存在时返回None
+    """
+    rag_core = sessions.get(session_id)
+    if session_store is None:
+        return rag_core
+    if rag_core is not None:
+        session_store.touch(session_id)
+        return rag_core
+    
+    rag_core = RAGCore()
+    rag_core.set_embedding_model(embedding_model)
+    if not session_store.load(session_id, rag_core):
+        return None
+    sessions[session_id] = rag_core
+    return rag_core
+
 def cleanup_expired_sessions():
     """清理过期会话"""
     current_time = time.time()
@@ -66,6 +111,10 @@ def cleanup_expired_sessions():
     
     if expired_sessions:
         print(f"清理了 {len(expired_sessions)} 个过期会话")
+    
+    # 共享会话目录按最后访问时间清理，各worker访问会话时都会更新该时间
+    if session_store is not None:
+        session_store.cleanup(SESSION_TIMEOUT)
 
 # 定期清理过期会话的任务
 async def periodic_cleanup():
@@ -81,17 +130,37 @@ embedding_model = EmbeddingModel()
 async def startup_event():
     asyncio.create_task(periodic_cleanup())
 
+# 在应用关闭时释放大模型连接池
+@app.on_event("shutdown")
+async def shutdown_event():
+    await llm_client.aclose()
+
 # 从环境变量获取API Key
 ZHIPU_API_KEY = os.getenv("ZHIPU_API_KEY")
 if not ZHIPU_API_KEY:
     raise ValueError("请设置 ZHIPU_API_KEY 环境变量")
 
-# 初始化ZhipuAI客户端
-zhipu_client = ZhipuAI(api_key=ZHIPU_API_KEY)
-
 # 定义使用的模型
 ZHIPUAI_MODEL = "glm-4-flash"
 
+# 大模型调用的截止时间、重试和对冲配置
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+
+# 初始化大模型客户端（复用保活连接）
+llm_client = LLMClient(
+    api_key=ZHIPU_API_KEY,
+    model=ZHIPUAI_MODEL,
+    timeout=LLM_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+    hedge=LLM_HEDGE,
+    hedge_percentile=LLM_HEDGE_PERCENTILE,
+    hedge_budget=LLM_HEDGE_BUDGET,
+)
+
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -180,6 +249,8 @@ async def upload_file(file: UploadFile = File(...)):
         # 存储会话
         sessions[session_id] = rag_core
         session_last_access[session_id] = time.time()
+        if session_store is not None:
+            session_store.save(session_id, rag_core)
         
         return {"session_id": session_id, "chunk_count": len(chunks)}
         
@@ -198,14 +269,13 @@ async def chat(request: ChatRequest):
     # 如果提供了session_id，则使用RAG流程
     if session_id:
         # 检查会话是否存在
-        if session_id not in sessions:
+        rag_core = get_session(session_id)
+        if rag_core is None:
             raise HTTPException(status_code=404, detail="会话不存在")
         
         # 更新会话最后访问时间
         session_last_access[session_id] = time.time()
         
-        rag_core = sessions[session_id]
-        
         # 检索相关文本，先检索9个候选文本块用于rerank
         results = rag_core.search(question, k=9)
         
@@ -218,12 +288,13 @@ async def chat(request: ChatRequest):
     
     try:
         # 调用GLM-4-Flash API
-        response = zhipu_client.chat.completions.create(
-            model=ZHIPUAI_MODEL,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        answer = await llm_client.chat([{"role": "user", "content": prompt}])
         
-        return {"answer": response.choices[0].message.content}
+        return {"answer": answer}
         
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="调用大模型超时")
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=f"调用大模型失败: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"调用大模型失败: {str(e)}")
@@ -18,7 +18,9 @@ class EmbeddingModel:
         self.model = SentenceTransformer('BAAI/bge-small-zh-v1.5', cache_folder=cache_dir)
     
     def encode(self, texts: list[str]) -> np.ndarray:
-        return self.model.encode(texts, convert_to_numpy=True)
+        # 在torch profiler的trace中标记向量编码的前向计算
+        with torch.profiler.record_function("EmbeddingModel.encode"):
+            return self.model.encode(texts, convert_to_numpy=True)
     
     def encode_queries(self, queries: List[str]) -> np.ndarray:
         """
@@ -30,4 +32,5 @@ class EmbeddingModel:
         Returns:
             编码后的向量数组
         """
-        return self.model.encode(queries, convert_to_numpy=True)
+        with torch.profiler.record_function("EmbeddingModel.encode_queries"):
+            return self.model.encode(queries, convert_to_numpy=True)
@@ -0,0 +1,79 @@
+import hmac
+import threading
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+
+from app.profiling.profiler import MODE_TORCH, ProfileStore, SamplingProfiler, select_mode, torch_profile
+
+# 触发性能分析的请求头，值为 torch 时使用torch profiler
+PROFILE_HEADER = "X-Profile"
+# 携带共享密钥的请求头，触发分析和下载分析文件都需要
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+
+# 同一时刻只分析一个请求：采样分析器作用于整个事件循环线程，torch profiler也不能同时开启多个，
+# 分析期间到达的其他请求不做分析
+_profiling_lock = threading.Lock()
+
+
+def _token_valid(request: Request, token: str) -> bool:
+    value = request.headers.get(PROFILE_TOKEN_HEADER, "")
+    return hmac.compare_digest(value.encode("utf-8"), token.encode("utf-8"))
+
+
+def install_profiling(app: FastAPI, store: ProfileStore, token: str, sample_rate: float = 0.0):
+    """
+    为应用注册按需性能分析中间件和分析文件下载接口，仅在启用性能分析时调用
+
+    注意：采样分析和torch profiler都作用于整个事件循环线程，分析期间并发处理的其他请求也会被记录。
+
+    Args:
+        app: FastAPI应用
+        store: 分析文件存储
+        token: 共享密钥，请求头 X-Profile 只有在 X-Profile-Token 与之匹配时才生效，下载分析文件同样需要
+        sample_rate: 未携带请求头时进行采样分析的概率
+    """
+    if not token:
+        raise ValueError("启用性能分析时必须设置共享密钥")
+
+    @app.middleware("http")
+    async def profiling_middleware(request: Request, call_next):
+        if request.url.path.startswith("/profiles/"):
+            return await call_next(request)
+        header_value: Optional[str] = request.headers.get(PROFILE_HEADER)
+        if header_value and not _token_valid(request, token):
+            header_value = None
+        mode = select_mode(header_value, sample_rate)
+        if mode is None or not _profiling_lock.acquire(blocking=False):
+            return await call_next(request)
+
+        try:
+            profile_id, profile_path = store.new_path(mode)
+            # 写文件和清理都放到线程池中执行，避免阻塞事件循环
+            if mode == MODE_TORCH:
+                with torch_profile() as prof:
+                    response = await call_next(request)
+                await run_in_threadpool(prof.export_chrome_trace, profile_path)
+            else:
+                # 请求处理函数在事件循环线程中执行，对该线程采样
+                with SamplingProfiler() as profiler:
+                    response = await call_next(request)
+                await run_in_threadpool(profiler.save, profile_path)
+            await run_in_threadpool(store.prune)
+        finally:
+            _profiling_lock.release()
+
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Profile-Url"] = f"/profiles/{profile_id}"
+        return response
+
+    @app.get("/profiles/{profile_id}")
+    async def download_profile(profile_id: str, request: Request):
+        if not _token_valid(request, token):
+            raise HTTPException(status_code=403, detail="无权下载性能分析文件")
+        path = store.find(profile_id)
+        if path is None:
+            raise HTTPException(status_code=404, detail="性能分析文件不存在")
+        return FileResponse(path, filename=path.name)
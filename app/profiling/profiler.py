@@ -0,0 +1,155 @@
+import os
+import random
+import sys
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+# 性能分析模式
+MODE_SAMPLING = "sampling"
+MODE_TORCH = "torch"
+
+# 各模式下生成的文件后缀
+PROFILE_SUFFIXES = {
+    MODE_SAMPLING: ".folded",
+    MODE_TORCH: ".torch.json",
+}
+
+
+def select_mode(header_value: Optional[str], sample_rate: float = 0.0) -> Optional[str]:
+    """
+    根据请求头和采样率决定本次请求的性能分析模式
+
+    Args:
+        header_value: 请求头的值，"torch" 表示使用torch profiler，其他非空值表示采样分析
+        sample_rate: 未携带请求头时进行采样分析的概率
+
+    Returns:
+        分析模式，不分析时返回None
+    """
+    if header_value:
+        value = header_value.strip().lower()
+        if value in ("0", "false", "off"):
+            return None
+        return MODE_TORCH if value == MODE_TORCH else MODE_SAMPLING
+    if sample_rate > 0 and random.random() < sample_rate:
+        return MODE_SAMPLING
+    return None
+
+
+class SamplingProfiler:
+    """
+    基于后台线程的采样分析器：定期抓取目标线程的调用栈，
+    输出折叠栈格式（folded stacks），可用 speedscope 或 flamegraph.pl 生成火焰图。
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        """
+        Args:
+            thread_id: 要采样的线程ID，默认为当前线程
+            interval: 采样间隔（秒）
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """
+        Returns:
+            折叠栈格式的文本，每行为 "栈帧;栈帧;... 采样次数"
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # 分号和空格在折叠栈格式中有特殊含义
+    return name.replace(";", ":").replace(" ", "_")
+
+
+@contextmanager
+def torch_profile():
+    """
+    使用torch profiler记录模型前向计算，结束后可调用 export_chrome_trace 导出Chrome trace文件
+    """
+    import torch
+
+    with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True) as prof:
+        yield prof
+
+
+class ProfileStore:
+    """保存性能分析文件的目录，只保留最近的若干个文件"""
+
+    def __init__(self, directory: Optional[str] = None, max_files: int = 50):
+        self.directory = Path(directory or os.path.join(tempfile.gettempdir(), "chatgpt-demo-profiles"))
+        self.max_files = max_files
+        os.makedirs(self.directory, exist_ok=True)
+
+    def new_path(self, mode: str):
+        """
+        Returns:
+            (分析ID, 文件路径)
+        """
+        profile_id = uuid.uuid4().hex
+        return profile_id, str(self.directory / f"{profile_id}{PROFILE_SUFFIXES[mode]}")
+
+    def find(self, profile_id: str) -> Optional[Path]:
+        # 只接受uuid格式的ID，防止路径穿越
+        try:
+            profile_id = uuid.UUID(profile_id).hex
+        except ValueError:
+            return None
+        for suffix in PROFILE_SUFFIXES.values():
+            path = self.directory / f"{profile_id}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def prune(self):
+        # 只清理本存储生成的分析文件，不触碰目录中的其他文件和子目录
+        suffixes = tuple(PROFILE_SUFFIXES.values())
+        files = [p for p in self.directory.iterdir() if p.is_file() and p.name.endswith(suffixes)]
+        files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in files[self.max_files:]:
+            path.unlink(missing_ok=True)
@@ -32,7 +32,9 @@ class Reranker:
         with torch.no_grad():  # 禁用梯度计算
             pairs = [[query, text] for text in texts]
             inputs = self._tokenizer(pairs, padding=True, truncation=True, return_tensors='pt', max_length=512)
-            scores = self._model(**inputs).logits.view(-1).float()
+            # 在torch profiler的trace中标记重排序的前向计算
+            with torch.profiler.record_function("Reranker.forward"):
+                scores = self._model(**inputs).logits.view(-1).float()
             results = [(texts[i], float(scores[i])) for i in range(len(texts))]
             # 按分数降序排序
             results.sort(key=lambda x: x[1], reverse=True)
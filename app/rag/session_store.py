@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Optional
+
+import faiss
+
+INDEX_FILE = "index.faiss"
+TEXTS_FILE = "texts.json"
+# 写入中的临时目录前缀，写完后原子重命名为会话ID
+TMP_PREFIX = ".tmp-"
+
+
+class SessionStore:
+    """
+    在多个worker进程共享的目录中保存会话的向量索引和文本，
+    使任意worker都能处理由其他worker创建的会话
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> Optional[str]:
+        # 只接受uuid格式的ID，防止路径穿越
+        try:
+            session_id = str(uuid.UUID(session_id))
+        except ValueError:
+            return None
+        return os.path.join(self.directory, session_id)
+
+    def save(self, session_id: str, rag_core):
+        """
+        保存会话的索引和文本
+
+        Args:
+            session_id: 会话ID
+            rag_core: 已建立索引的RAG核心实例
+        """
+        path = self._path(session_id)
+        if path is None:
+            raise ValueError(f"无效的会话ID: {session_id}")
+        tmp_dir = tempfile.mkdtemp(dir=self.directory, prefix=TMP_PREFIX)
+        try:
+            faiss.write_index(rag_core.index, os.path.join(tmp_dir, INDEX_FILE))
+            with open(os.path.join(tmp_dir, TEXTS_FILE), "w", encoding="utf-8") as f:
+                json.dump(rag_core.texts, f, ensure_ascii=False)
+            os.rename(tmp_dir, path)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def load(self, session_id: str, rag_core) -> bool:
+        """
+        将会话的索引和文本加载到RAG核心实例中
+
+        Args:
+            session_id: 会话ID
+            rag_core: 要填充的RAG核心实例
+
+        Returns:
+            会话是否存在
+        """
+        path = self._path(session_id)
+        if path is None or not os.path.isdir(path):
+            return False
+        try:
+            index = faiss.read_index(os.path.join(path, INDEX_FILE))
+            with open(os.path.join(path, TEXTS_FILE), encoding="utf-8") as f:
+                texts = json.load(f)
+        except (OSError, RuntimeError):
+            # 会话可能刚被其他worker清理
+            return False
+        rag_core.index = index
+        rag_core.texts = texts
+        self.touch(session_id)
+        return True
+
+    def touch(self, session_id: str):
+        """更新会话的最后访问时间，避免被其他worker当作过期会话清理"""
+        path = self._path(session_id)
+        if path is None:
+            return
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self, timeout: float) -> int:
+        """
+        删除超过指定时长未访问的会话
+
+        Returns:
+            删除的会话数量
+        """
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+            if not name.startswith(TMP_PREFIX) and self._path(name) is None:
+                continue
+            try:
+                expired = now - os.path.getmtime(path) > timeout
+            except FileNotFoundError:
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
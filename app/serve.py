@@ -0,0 +1,240 @@
+"""
+多进程服务模式：父进程加载并预热模型后fork出多个worker，
+worker以写时复制（copy-on-write）的方式共享模型权重，并按CPU核数划分torch的intra-op线程数。
+
+inter-op线程数固定为每个worker 1个：torch只允许在进程开始并行计算前设置一次，
+而预热发生在父进程中，fork出的worker会继承该值、无法再各自调整；
+当前的推理都是eager模式，不使用inter-op线程池（只有torch.jit.fork等异步算子会用到）。
+
+仅支持Linux/macOS（依赖fork）。用法：
+    python -m app.serve --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+
+# worker启动后在该时长（秒）内退出视为启动失败，重启前按指数退避等待
+MIN_UPTIME = 10
+MAX_RESTART_DELAY = 60
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def partition_threads(workers: int, cpus: int) -> List[int]:
+    """
+    将CPU核数平均分配给各worker作为torch的intra-op线程数
+
+    Args:
+        workers: worker数量
+        cpus: 可用的CPU核数
+
+    Returns:
+        每个worker的线程数，核数不足时每个worker至少1个线程
+    """
+    base, extra = divmod(cpus, workers)
+    return [max(1, base + (1 if i < extra else 0)) for i in range(workers)]
+
+
+def warm_models():
+    """加载并预热 EmbeddingModel 和 Reranker"""
+    from app.main import embedding_model
+    from app.rag.core import Reranker
+
+    embedding_model.encode(["预热"])
+    Reranker().rerank("预热", ["预热文本一", "预热文本二"], top_k=1)
+
+
+def load_app():
+    """
+    在父进程中导入应用并预热模型，使权重在fork前就位
+
+    Returns:
+        FastAPI应用实例
+    """
+    import torch
+
+    # 预热时只用单线程，避免在fork前创建OpenMP线程池；
+    # inter-op线程数只能设置一次，worker会继承该值
+    torch.set_num_threads(1)
+    torch.set_num_interop_threads(1)
+
+    from app.main import app
+
+    warm_models()
+
+    # 将已加载的对象移出GC跟踪，避免GC写入对象头导致共享页面被复制
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def run_worker(app, config, sock, threads: int):
+    import torch
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """
+    管理worker进程：fork启动，异常退出时按指数退避重启，收到停止信号时结束所有worker。
+
+    fork/wait/kill/clock/sleep 可以注入，便于测试。
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        run_child: Callable[[int], None],
+        fork: Optional[Callable[[], int]] = None,
+        wait: Optional[Callable[[], tuple]] = None,
+        kill: Optional[Callable[[int, int], None]] = None,
+        clock: Optional[Callable[[], float]] = None,
+        sleep: Optional[Callable[[float], object]] = None,
+    ):
+        """
+        Args:
+            workers: worker数量
+            run_child: 在子进程中运行worker的函数，参数为worker序号
+            fork/wait/kill/clock: 对应的系统调用和时钟，默认为 os.fork/os.wait/os.kill/time.monotonic
+            sleep: 重启前的等待函数，默认等待停止事件，收到停止信号后立即返回
+        """
+        self.workers = workers
+        self.run_child = run_child
+        self._fork = fork or os.fork
+        self._wait = wait or os.wait
+        self._kill = kill or os.kill
+        self._clock = clock or time.monotonic
+        self._stop_event = threading.Event()
+        self._sleep = sleep or self._stop_event.wait
+
+        self.children: Dict[int, int] = {}
+        self.spawned_at: Dict[int, float] = {}
+        self.restart_delays: Dict[int, float] = {}
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event.is_set()
+
+    def spawn(self, index: int):
+        # fork前刷新缓冲区，避免子进程重复输出
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = self._fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.run_child(index)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+        self.spawned_at[index] = self._clock()
+        print(f"启动worker {pid}（序号 {index}）")
+        # fork期间收到停止信号时，新worker没有被通知到
+        if self.stopping:
+            self._terminate(pid)
+
+    def stop(self, signum=None, frame=None):
+        """停止所有worker，可直接作为信号处理函数"""
+        self._stop_event.set()
+        for pid in list(self.children):
+            self._terminate(pid)
+
+    def _terminate(self, pid: int):
+        try:
+            self._kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def restart_delay(self, index: int) -> float:
+        """
+        计算worker重启前的等待时长：启动后很快退出说明启动失败，逐次加倍，最长 MAX_RESTART_DELAY 秒
+        """
+        if self._clock() - self.spawned_at[index] < MIN_UPTIME:
+            delay = min(self.restart_delays.get(index, 0.5) * 2, MAX_RESTART_DELAY)
+        else:
+            delay = 1
+        self.restart_delays[index] = delay
+        return delay
+
+    def run(self):
+        for index in range(self.workers):
+            self.spawn(index)
+
+        # 监控worker，异常退出时重新拉起
+        while self.children:
+            try:
+                pid, status = self._wait()
+            except ChildProcessError:
+                break
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            delay = self.restart_delay(index)
+            print(f"worker {pid} 退出（状态 {status}），{delay:.0f}秒后重新启动")
+            self._sleep(delay)
+            if not self.stopping:
+                self.spawn(index)
+
+
+def serve(host: str, port: int, workers: int, log_level: str = "info"):
+    threads = partition_threads(workers, available_cpus())
+    # 必须在导入torch之前设置，限制底层数学库的线程数
+    os.environ.setdefault("OMP_NUM_THREADS", str(min(threads)))
+    os.environ.setdefault("MKL_NUM_THREADS", str(min(threads)))
+    # 父进程预热时已使用过tokenizers，fork后其并行会被关闭并打印警告，这里显式关闭
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # 会话默认只保存在worker内存中，多worker时改用共享目录，任意worker都能处理上传得到的会话
+    if workers > 1:
+        os.environ.setdefault("SESSION_DIR", os.path.join(tempfile.gettempdir(), "chatgpt-demo-sessions"))
+
+    import uvicorn
+
+    app = load_app()
+    config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+    sock = config.bind_socket()
+
+    supervisor = Supervisor(workers, lambda index: run_worker(app, config, sock, threads[index]))
+    signal.signal(signal.SIGINT, supervisor.stop)
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    for index, count in enumerate(threads):
+        print(f"worker {index} 的torch线程数: {count}")
+    supervisor.run()
+
+    sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程文档问答服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers 必须大于等于1")
+
+    if not hasattr(os, "fork"):
+        sys.exit("多进程服务模式依赖fork，当前平台不支持")
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import os
+import sys
+import asyncio
+import gc
+import time
+
+import httpx
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.llm.client import LLMClient, LLMError
+
+
+def make_response(content: str) -> dict:
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+def make_client(handler, **kwargs) -> LLMClient:
+    return LLMClient(
+        api_key="test-key",
+        model="glm-4-flash",
+        base_url="https://llm.test",
+        backoff_base=0.01,
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_content():
+    """
+    测试正常调用返回回答文本，并携带API密钥
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["Authorization"] == "Bearer test-key"
+        return httpx.Response(200, json=make_response("你好"))
+
+    client = make_client(handler)
+    assert await client.chat([{"role": "user", "content": "hi"}]) == "你好"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retry_on_429_and_5xx():
+    """
+    测试遇到429和5xx时重试
+    """
+    statuses = [429, 503]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if statuses:
+            return httpx.Response(statuses.pop(0))
+        return httpx.Response(200, json=make_response("ok"))
+
+    client = make_client(handler, max_retries=2)
+    assert await client.chat([{"role": "user", "content": "hi"}]) == "ok"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_no_retry_on_client_error():
+    """
+    测试4xx错误（429除外）不重试
+    """
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(401)
+
+    client = make_client(handler, max_retries=3)
+    with pytest.raises(LLMError) as exc_info:
+        await client.chat([{"role": "user", "content": "hi"}])
+    assert exc_info.value.status_code == 401
+    assert len(calls) == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_deadline_exceeded():
+    """
+    测试超过截止时间时抛出超时异常
+    """
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=make_response("slow"))
+
+    client = make_client(handler, timeout=0.1)
+    with pytest.raises(asyncio.TimeoutError):
+        await client.chat([{"role": "user", "content": "hi"}])
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins():
+    """
+    测试主请求过慢时对冲请求先返回
+    """
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+            return httpx.Response(200, json=make_response("slow"))
+        return httpx.Response(200, json=make_response("fast"))
+
+    client = make_client(handler, hedge=True, hedge_budget=1.0, hedge_min_samples=3)
+    client._latencies.extend([0.01, 0.01, 0.01])
+    assert await client.chat([{"role": "user", "content": "hi"}]) == "fast"
+    assert len(calls) == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_limits_extra_requests():
+    """
+    测试对冲预算用尽后不再发送对冲请求
+    """
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=make_response("ok"))
+
+    client = make_client(handler, hedge=True, hedge_budget=0.0, hedge_min_samples=3)
+    client._latencies.extend([0.001, 0.001, 0.001])
+    assert await client.chat([{"role": "user", "content": "hi"}]) == "ok"
+    assert len(calls) == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hedge_retrieves_failed_task_exception():
+    """
+    测试主请求与对冲请求同一轮完成时，失败任务的异常也被取出
+    """
+    client = make_client(lambda request: httpx.Response(200, json=make_response("ok")),
+                         hedge=True, hedge_budget=1.0, hedge_min_samples=3)
+    client._latencies.extend([0.001, 0.001, 0.001])
+    loop = asyncio.get_running_loop()
+    unretrieved = []
+    loop.set_exception_handler(lambda loop, context: unretrieved.append(context))
+
+    # 完成顺序取决于集合的迭代顺序，多次重复以覆盖成功任务先被遍历的情况
+    for _ in range(100):
+        release = asyncio.Event()
+        calls = []
+
+        async def fake_with_retries(payload, deadline, state=None):
+            calls.append(payload)
+            if len(calls) == 1:
+                loop.call_later(0.005, release.set)
+                await release.wait()
+                raise LLMError("primary failed", status_code=500)
+            await release.wait()
+            return make_response("hedged")
+
+        client._with_retries = fake_with_retries
+        assert await client.chat([{"role": "user", "content": "hi"}]) == "hedged"
+
+    gc.collect()
+    await asyncio.sleep(0)
+    assert not unretrieved
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_is_a_sliding_window():
+    """
+    测试长时间的快速请求不会积累对冲额度：随后连续的慢请求中，对冲比例不超过预算
+    """
+    client = make_client(lambda request: httpx.Response(200, json=make_response("ok")),
+                         hedge=True, hedge_budget=0.1, hedge_min_samples=3, latency_window=50)
+    client._latencies.extend([0.001, 0.001, 0.001])
+    slow = False
+    hedges = 0
+
+    async def fake_with_retries(payload, deadline, state=None):
+        nonlocal hedges
+        if not slow:
+            return make_response("ok")
+        if not payload.get("primary_started"):
+            payload["primary_started"] = True
+            await asyncio.sleep(0.02)
+            return make_response("primary")
+        hedges += 1
+        return make_response("hedged")
+
+    client._with_retries = fake_with_retries
+    for _ in range(500):
+        await client.chat([{"role": "user", "content": "hi"}])
+
+    slow = True
+    for _ in range(100):
+        await client.chat([{"role": "user", "content": "hi"}])
+    assert 0 < hedges <= 0.1 * 100
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured():
+    """
+    测试429响应的Retry-After被遵守
+    """
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.2"})
+        return httpx.Response(200, json=make_response("ok"))
+
+    client = make_client(handler, max_retries=1)
+    assert await client.chat([{"role": "user", "content": "hi"}]) == "ok"
+    assert calls[1] - calls[0] >= 0.2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_transport_error_is_retried():
+    """
+    测试网络错误会重试
+    """
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json=make_response("ok"))
+
+    client = make_client(handler, max_retries=1)
+    assert await client.chat([{"role": "user", "content": "hi"}]) == "ok"
+    assert len(calls) == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_no_retry_when_backoff_passes_deadline():
+    """
+    测试退避时间超过截止时间时不再重试，直接报错
+    """
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "5"})
+
+    client = make_client(handler, timeout=1, max_retries=3)
+    start = time.monotonic()
+    with pytest.raises(LLMError) as exc_info:
+        await client.chat([{"role": "user", "content": "hi"}])
+    assert exc_info.value.status_code == 429
+    assert len(calls) == 1
+    assert time.monotonic() - start < 0.5
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_after_rate_limited():
+    """
+    测试主请求被限流后不发送对冲请求
+    """
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        return httpx.Response(200, json=make_response("ok"))
+
+    client = make_client(handler, max_retries=1, hedge=True, hedge_budget=1.0, hedge_min_samples=3)
+    client._latencies.extend([0.001, 0.001, 0.001])
+    assert await client.chat([{"role": "user", "content": "hi"}]) == "ok"
+    # 第二次调用是Retry-After之后的重试，而不是立即发送的对冲请求
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.05
+    await client.aclose()
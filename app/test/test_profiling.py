@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.profiling import middleware
+from app.profiling.middleware import install_profiling
+from app.profiling.profiler import MODE_SAMPLING, MODE_TORCH, ProfileStore, SamplingProfiler, select_mode, torch_profile
+
+
+TOKEN = "secret"
+AUTH = {"X-Profile-Token": TOKEN}
+
+
+def busy_work(duration: float):
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_select_mode():
+    """
+    测试根据请求头和采样率选择分析模式
+    """
+    assert select_mode(None) is None
+    assert select_mode("1") == MODE_SAMPLING
+    assert select_mode("Torch") == MODE_TORCH
+    assert select_mode("off", sample_rate=1.0) is None
+    assert select_mode(None, sample_rate=1.0) == MODE_SAMPLING
+
+
+def test_sampling_profiler_captures_stack():
+    """
+    测试采样分析器能抓到正在执行的函数
+    """
+    with SamplingProfiler(interval=0.001) as profiler:
+        busy_work(0.2)
+
+    folded = profiler.folded()
+    assert "busy_work" in folded
+    for line in folded.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+
+
+def test_profile_store(tmp_path):
+    """
+    测试分析文件的查找与清理
+    """
+    store = ProfileStore(str(tmp_path), max_files=2)
+    ids = []
+    for _ in range(3):
+        profile_id, path = store.new_path(MODE_SAMPLING)
+        with open(path, "w") as f:
+            f.write("main 1\n")
+        ids.append(profile_id)
+        time.sleep(0.01)
+    store.prune()
+
+    assert store.find(ids[0]) is None
+    assert store.find(ids[2]) is not None
+    assert store.find("../../etc/passwd") is None
+
+
+def test_profile_store_prune_keeps_foreign_entries(tmp_path):
+    """
+    测试清理时只删除分析文件，不影响目录中的其他文件和子目录
+    """
+    (tmp_path / "important.db").write_text("data")
+    (tmp_path / "subdir").mkdir()
+    store = ProfileStore(str(tmp_path), max_files=1)
+    for _ in range(2):
+        _, path = store.new_path(MODE_SAMPLING)
+        with open(path, "w") as f:
+            f.write("main 1\n")
+        time.sleep(0.01)
+    store.prune()
+
+    assert (tmp_path / "important.db").exists()
+    assert (tmp_path / "subdir").is_dir()
+    assert len(list(tmp_path.glob("*.folded"))) == 1
+
+
+def make_profiled_app(tmp_path) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        busy_work(0.05)
+        return {"ok": True}
+
+    install_profiling(app, ProfileStore(str(tmp_path)), token=TOKEN)
+    return TestClient(app)
+
+
+def test_middleware_profiles_request(tmp_path):
+    """
+    测试携带请求头时生成分析文件，并可通过下载接口获取
+    """
+    client = make_profiled_app(tmp_path)
+    response = client.get("/work", headers={"X-Profile": "1", **AUTH})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert response.headers["X-Profile-Url"] == f"/profiles/{profile_id}"
+
+    download = client.get(f"/profiles/{profile_id}", headers=AUTH)
+    assert download.status_code == 200
+    assert "busy_work" in download.text
+
+
+def test_middleware_skips_unprofiled_requests(tmp_path):
+    """
+    测试未携带请求头，或已有请求正在分析时不做分析
+    """
+    client = make_profiled_app(tmp_path)
+    assert "X-Profile-Id" not in client.get("/work").headers
+
+    middleware._profiling_lock.acquire()
+    try:
+        response = client.get("/work", headers={"X-Profile": "1", **AUTH})
+    finally:
+        middleware._profiling_lock.release()
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+def test_profiling_requires_token(tmp_path):
+    """
+    测试未携带或携带错误的共享密钥时不做分析，也不能下载分析文件
+    """
+    client = make_profiled_app(tmp_path)
+    for headers in ({"X-Profile": "1"}, {"X-Profile": "1", "X-Profile-Token": "wrong"}):
+        response = client.get("/work", headers=headers)
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+    assert not list(tmp_path.iterdir())
+
+    profile_id = client.get("/work", headers={"X-Profile": "1", **AUTH}).headers["X-Profile-Id"]
+    assert client.get(f"/profiles/{profile_id}").status_code == 403
+    assert client.get(f"/profiles/{profile_id}", headers={"X-Profile-Token": "wrong"}).status_code == 403
+
+
+def test_install_profiling_requires_token(tmp_path):
+    """
+    测试未设置共享密钥时拒绝启用性能分析
+    """
+    with pytest.raises(ValueError):
+        install_profiling(FastAPI(), ProfileStore(str(tmp_path)), token="")
+
+
+def test_download_profile_not_found(tmp_path):
+    """
+    测试下载不存在或非法ID的分析文件返回404
+    """
+    client = make_profiled_app(tmp_path)
+    assert client.get("/profiles/0123456789abcdef0123456789abcdef", headers=AUTH).status_code == 404
+    assert client.get("/profiles/not-a-uuid", headers=AUTH).status_code == 404
+
+
+def test_torch_profile(tmp_path):
+    """
+    测试torch profiler导出Chrome trace文件
+    """
+    torch = pytest.importorskip("torch")
+    path = str(tmp_path / "trace.torch.json")
+    with torch_profile() as prof:
+        torch.ones(8, 8) @ torch.ones(8, 8)
+    prof.export_chrome_trace(path)
+
+    with open(path) as f:
+        assert "traceEvents" in json.load(f)
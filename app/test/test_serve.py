@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.serve import MAX_RESTART_DELAY, MIN_UPTIME, Supervisor, main, partition_threads
+
+
+def test_partition_threads():
+    """
+    测试按worker数量划分torch线程数
+    """
+    assert partition_threads(1, 8) == [8]
+    assert partition_threads(4, 8) == [2, 2, 2, 2]
+    assert partition_threads(3, 8) == [3, 3, 2]
+    # 核数少于worker数时每个worker至少1个线程
+    assert partition_threads(4, 2) == [1, 1, 1, 1]
+
+
+def test_main_rejects_invalid_workers():
+    """
+    测试worker数量小于1时报错退出
+    """
+    for workers in ("0", "-1"):
+        with pytest.raises(SystemExit) as exc_info:
+            main(["--workers", workers])
+        assert exc_info.value.code == 2
+
+
+class FakeProcesses:
+    """模拟fork/wait/kill：fork返回递增的pid，wait按脚本返回退出的worker"""
+
+    def __init__(self):
+        self.next_pid = 100
+        self.forked = []
+        self.killed = []
+        self.exited = []
+
+    def fork(self):
+        pid = self.next_pid
+        self.next_pid += 1
+        self.forked.append(pid)
+        return pid
+
+    def kill(self, pid, sig):
+        self.killed.append(pid)
+        self.exited.append(pid)
+
+
+def test_supervisor_restarts_crashed_worker_with_capped_backoff():
+    """
+    测试worker启动后很快退出时被重启，等待时间逐次加倍且不超过上限
+    """
+    procs = FakeProcesses()
+    delays = []
+
+    def wait():
+        # 每次都是最近启动的worker立即退出
+        return procs.forked[-1], 256
+
+    def sleep(delay):
+        delays.append(delay)
+        if len(delays) == 8:
+            supervisor.stop()
+
+    supervisor = Supervisor(1, run_child=None, fork=procs.fork, wait=wait, kill=procs.kill,
+                            clock=lambda: 0.0, sleep=sleep)
+    supervisor.run()
+
+    assert delays == [1, 2, 4, 8, 16, 32, MAX_RESTART_DELAY, MAX_RESTART_DELAY]
+    # 首次启动加上7次重启，收到停止信号后不再重启
+    assert len(procs.forked) == 8
+
+
+def test_supervisor_resets_backoff_after_long_uptime():
+    """
+    测试worker正常运行超过 MIN_UPTIME 后退出时，以最短等待时间重启
+    """
+    procs = FakeProcesses()
+    now = [0.0]
+    delays = []
+
+    def wait():
+        now[0] += MIN_UPTIME + 1
+        return procs.forked[-1], 0
+
+    def sleep(delay):
+        delays.append(delay)
+        if len(delays) == 3:
+            supervisor.stop()
+
+    supervisor = Supervisor(1, run_child=None, fork=procs.fork, wait=wait, kill=procs.kill,
+                            clock=lambda: now[0], sleep=sleep)
+    supervisor.run()
+    assert delays == [1, 1, 1]
+
+
+def test_supervisor_stop_terminates_all_workers():
+    """
+    测试收到停止信号时向所有worker发送SIGTERM，且不再重启
+    """
+    procs = FakeProcesses()
+
+    def wait():
+        if not supervisor.stopping:
+            supervisor.stop()
+        return procs.exited.pop(0), 0
+
+    supervisor = Supervisor(3, run_child=None, fork=procs.fork, wait=wait, kill=procs.kill,
+                            clock=lambda: 0.0, sleep=lambda delay: pytest.fail("不应重启"))
+    supervisor.run()
+
+    assert sorted(procs.killed) == [100, 101, 102]
+    assert procs.forked == [100, 101, 102]
+    assert not supervisor.children
+
+
+def test_supervisor_stop_interrupts_restart_backoff():
+    """
+    测试真实fork的worker启动失败后，在重启等待期间收到停止信号能立即退出
+    """
+    def run_child(index):
+        raise RuntimeError("worker启动失败")
+
+    supervisor = Supervisor(1, run_child)
+    threading.Timer(0.5, supervisor.stop).start()
+    start = time.monotonic()
+    supervisor.run()
+
+    # 第一次重启等待1秒，之后加倍；停止信号应在等待期间立即生效
+    assert time.monotonic() - start < 1.5
+    assert not supervisor.children
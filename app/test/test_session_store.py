@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+faiss = pytest.importorskip("faiss")
+np = pytest.importorskip("numpy")
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.rag.session_store import SessionStore
+
+
+def make_rag_core(texts):
+    index = faiss.IndexFlatL2(4)
+    index.add(np.random.rand(len(texts), 4).astype(np.float32))
+    return SimpleNamespace(index=index, texts=texts)
+
+
+def test_save_and_load(tmp_path):
+    """
+    测试一个worker保存的会话可以被另一个worker加载
+    """
+    session_id = str(uuid.uuid4())
+    SessionStore(str(tmp_path)).save(session_id, make_rag_core(["第一段", "第二段"]))
+
+    loaded = SimpleNamespace(index=None, texts=[])
+    assert SessionStore(str(tmp_path)).load(session_id, loaded)
+    assert loaded.texts == ["第一段", "第二段"]
+    assert loaded.index.ntotal == 2
+
+
+def test_load_missing_or_invalid_session(tmp_path):
+    """
+    测试加载不存在或非法ID的会话返回False
+    """
+    store = SessionStore(str(tmp_path))
+    rag_core = SimpleNamespace(index=None, texts=[])
+    assert not store.load(str(uuid.uuid4()), rag_core)
+    assert not store.load("../../etc", rag_core)
+    assert rag_core.index is None
+
+
+def test_cleanup_expired_sessions(tmp_path):
+    """
+    测试只清理过期的会话，访问过的会话和其他文件保留
+    """
+    store = SessionStore(str(tmp_path))
+    old_id, fresh_id = str(uuid.uuid4()), str(uuid.uuid4())
+    store.save(old_id, make_rag_core(["旧"]))
+    store.save(fresh_id, make_rag_core(["新"]))
+    (tmp_path / "other").mkdir()
+    past = time.time() - 100
+    for name in (old_id, fresh_id, "other"):
+        os.utime(tmp_path / name, (past, past))
+    store.touch(fresh_id)
+
+    assert store.cleanup(timeout=50) == 1
+    assert not (tmp_path / old_id).exists()
+    assert (tmp_path / fresh_id).exists()
+    assert (tmp_path / "other").exists()
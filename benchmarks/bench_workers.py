@@ -0,0 +1,183 @@
+"""
+多进程服务基准测试：随worker数量增加，统计每个worker的内存占用和吞吐量。
+
+对比两种模式：
+    fork    - python -m app.serve，父进程预加载模型，worker写时复制共享权重
+    uvicorn - uvicorn --workers，每个worker各自加载并预热模型（见 benchmarks/uvicorn_app.py）
+
+两种模式都预热 EmbeddingModel 和 Reranker，并等待所有worker就绪、经过不计时的预热压测后，
+再开始计时压测和统计内存。
+
+仅支持Linux（读取 /proc 统计内存）。用法（在项目根目录执行）：
+    python benchmarks/bench_workers.py --workers 1,2,4 --mode fork,uvicorn
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+# 上传的测试文档：触发分块与向量编码
+SAMPLE_TEXT = "人工智能是计算机科学的一个分支，它企图了解智能的实质。" * 40 + "\n"
+
+
+def start_server(mode: str, workers: int, port: int, ready_dir: str) -> subprocess.Popen:
+    env = dict(os.environ, BENCH_READY_DIR=ready_dir)
+    if mode == "fork":
+        cmd = [sys.executable, "-m", "app.serve", "--workers", str(workers), "--port", str(port), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "benchmarks.uvicorn_app:app", "--workers", str(workers), "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(cmd, start_new_session=True, env=env)
+
+
+def wait_ready(proc: subprocess.Popen, mode: str, workers: int, port: int, ready_dir: str, timeout: float = 600):
+    """
+    等待所有worker就绪：worker数量达到预期，uvicorn模式下每个worker都写入了预热完成标记，且服务可以响应
+    （fork模式在父进程中预热，fork出的worker即已加载模型）
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pids = worker_pids(proc.pid, mode)
+        warmed = mode == "fork" or len(set(os.listdir(ready_dir)) & {str(pid) for pid in pids}) == workers
+        if len(pids) == workers and warmed:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+        time.sleep(1)
+    raise RuntimeError("服务启动超时")
+
+
+def child_pids(pid: int) -> List[int]:
+    path = f"/proc/{pid}/task/{pid}/children"
+    try:
+        with open(path) as f:
+            return [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def worker_pids(root: int, mode: str) -> List[int]:
+    children = child_pids(root)
+    if mode == "fork":
+        return children
+    # uvicorn的worker是由主进程spawn的python子进程，排除multiprocessing的辅助进程
+    pids = []
+    for pid in children:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read()
+        if b"resource_tracker" not in cmdline:
+            pids.append(pid)
+    # 单worker时uvicorn直接在主进程中处理请求
+    return pids or [root]
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """
+    读取进程的RSS、PSS（共享页按进程数均摊）和USS（私有页）
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": values.get("Rss", 0.0),
+        "pss": values.get("Pss", 0.0),
+        "uss": values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0),
+    }
+
+
+async def run_load(port: int, duration: float, concurrency: int):
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    files = {"file": ("bench.txt", SAMPLE_TEXT.encode("utf-8"), "text/plain")}
+
+    async def user(client: httpx.AsyncClient):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            try:
+                response = await client.post(f"http://127.0.0.1:{port}/upload/", files=files)
+                if response.status_code == 200:
+                    latencies.append(time.monotonic() - start)
+                else:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+
+    start = time.monotonic()
+    async with httpx.AsyncClient(timeout=60) as client:
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+    # 最后一批请求会在截止时间之后完成，按实际耗时计算吞吐量
+    return latencies, errors, time.monotonic() - start
+
+
+def bench(mode: str, workers: int, port: int, duration: float, concurrency: int, warmup: float) -> dict:
+    ready_dir = tempfile.mkdtemp(prefix="bench-ready-")
+    proc = start_server(mode, workers, port, ready_dir)
+    try:
+        wait_ready(proc, mode, workers, port, ready_dir)
+        # 不计时的预热压测
+        asyncio.run(run_load(port, warmup, concurrency))
+        latencies, errors, elapsed = asyncio.run(run_load(port, duration, concurrency))
+        # 负载之后再统计内存，反映服务过程中被复制的共享页
+        pids = worker_pids(proc.pid, mode)
+        memory = [memory_mb(pid) for pid in pids]
+        # 总PSS包含主进程（fork模式下主进程同样持有共享的模型权重）
+        total_pss = sum(memory_mb(pid)["pss"] for pid in set(pids) | {proc.pid})
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=60)
+        shutil.rmtree(ready_dir, ignore_errors=True)
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "workers": len(pids),
+        "rss": statistics.mean(m["rss"] for m in memory),
+        "pss": statistics.mean(m["pss"] for m in memory),
+        "uss": statistics.mean(m["uss"] for m in memory),
+        "total_pss": total_pss,
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="逗号分隔的worker数量")
+    parser.add_argument("--mode", default="fork,uvicorn", help="逗号分隔的服务模式：fork、uvicorn")
+    parser.add_argument("--duration", type=float, default=20, help="每组压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=5, help="每组计时前的预热压测时长（秒）")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发请求数")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    header = f"{'模式':<8}{'worker':>7}{'RSS/MB':>10}{'PSS/MB':>10}{'USS/MB':>10}{'总PSS/MB':>11}{'req/s':>9}{'p50/ms':>9}{'p99/ms':>9}{'错误':>6}"
+    print(header)
+    for mode in args.mode.split(","):
+        for workers in (int(w) for w in args.workers.split(",")):
+            r = bench(mode, workers, args.port, args.duration, args.concurrency, args.warmup)
+            print(
+                f"{r['mode']:<8}{r['workers']:>7}{r['rss']:>10.0f}{r['pss']:>10.0f}{r['uss']:>10.0f}"
+                f"{r['total_pss']:>11.0f}{r['rps']:>9.1f}{r['p50']:>9.0f}{r['p99']:>9.0f}{r['errors']:>6}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+供基准测试的 uvicorn 模式使用：每个worker导入时各自加载并预热与fork模式相同的模型，
+保证两种模式在统计内存时都已加载 EmbeddingModel 和 Reranker。
+
+预热完成后在 BENCH_READY_DIR 目录下写入以进程ID命名的标记文件，基准测试据此判断所有worker已就绪。
+"""
+import os
+
+from app.main import app
+from app.serve import warm_models
+
+warm_models()
+
+if os.getenv("BENCH_READY_DIR"):
+    with open(os.path.join(os.environ["BENCH_READY_DIR"], str(os.getpid())), "w"):
+        pass